@@ -1,10 +1,17 @@
 import os
-import json
+import csv
+import orjson
+import functools
 import logging
 import requests
 import re
-import pandas as pd
-from flask import Flask, request, jsonify
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from dotenv import load_dotenv
 from groq import Groq
@@ -13,20 +20,51 @@ from groq import Groq
 load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+class OrjsonProvider(DefaultJSONProvider):
+    # Routes request.json / jsonify through orjson instead of the stdlib json module.
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
 AI_MODEL = "llama-3.1-8b-instant"
 HISTORY_LIMIT = 30 
+MAX_SESSIONS = 10_000
+SESSION_TTL = 3600  # seconds of inactivity before a session is dropped
+TELEGRAM_TIMEOUT = 5
+CONTACT_CACHE_MAX_LEN = 64
+TELEGRAM_MAX_CHARS = 4000  # Telegram rejects messages over 4096 UTF-16 units
 
 class DataStore:
     knowledge_base = ""
     groq_client = None
 
 data_store = DataStore()
-SESSIONS = {}
+SESSIONS = OrderedDict()  # least recently used first
+_SESSIONS_LOCK = Lock()
+
+class _DigitFilter(dict):
+    # str.translate table: keeps decimal digits (same set as regex \d), drops the rest.
+    # Only digits are memoized, so client input cannot grow the table beyond the Nd set.
+    def __missing__(self, code):
+        if not chr(code).isdecimal(): return None
+        self[code] = code
+        return code
+
+_DIGIT_FILTER = _DigitFilter()
+
+def _only_digits(s):
+    return s.translate(_DIGIT_FILTER)
 
 # --- NODE 1: INITIALIZATION ---
+_KB_SUBS = {"Agile": "چابک", "Transformation": "تحول"}
+_KB_RE = re.compile("|".join(map(re.escape, _KB_SUBS)))
+
 def initialize_system():
     # Prevent re-initialization
     if data_store.groq_client: return
@@ -41,13 +79,15 @@ def initialize_system():
     # In Render, ensure 'about.txt' and 'services.csv' are in the root folder
     if os.path.exists('about.txt'):
         with open('about.txt', 'r', encoding='utf-8') as f:
-            content = f.read().replace("Agile", "چابک").replace("Transformation", "تحول")
+            content = _KB_RE.sub(lambda m: _KB_SUBS[m.group(0)], f.read())
             kb_parts.append(f"[COMPANY PROFILE]\n{content}")
     
     if os.path.exists('services.csv'):
         try:
-            df = pd.read_csv('services.csv')
-            kb_parts.append(f"[SERVICES]\n{df.to_string(index=False)}")
+            with open('services.csv', newline='', encoding='utf-8') as f:
+                rows = list(csv.reader(f))
+            services = "\n".join(" | ".join(row) for row in rows)
+            kb_parts.append(f"[SERVICES]\n{services}")
         except Exception as e:
             logging.error(f"Error loading services.csv: {e}")
 
@@ -72,25 +112,62 @@ def call_ai(messages, json_mode=False, temperature=0.2):
         logging.error(f"AI Error: {e}")
         return "{}" if json_mode else "System Error."
 
+def call_ai_stream(messages, temperature=0.2):
+    if not data_store.groq_client:
+        logging.error("❌ AI Client is NOT initialized.")
+        return
+    try:
+        stream = data_store.groq_client.chat.completions.create(
+            messages=messages, model=AI_MODEL, temperature=temperature, stream=True)
+        for chunk in stream:
+            token = chunk.choices[0].delta.content
+            if token: yield token
+    except Exception as e:
+        logging.error(f"AI Stream Error: {e}")
+        yield "System Error."
+
 def is_real_contact(contact_str):
     if not contact_str: return False
     s = str(contact_str)
+    # Only short strings are memoized so the cache cannot pin large client payloads.
+    if len(s) <= CONTACT_CACHE_MAX_LEN: return _is_real_contact_cached(s)
+    return _check_contact(s)
+
+def _check_contact(s):
     if "@" in s and "." in s: return True
-    digits = re.sub(r"\D", "", s) 
+    digits = _only_digits(s)
     if len(digits) >= 7: return True
     return False
 
+_is_real_contact_cached = functools.lru_cache(maxsize=4096)(_check_contact)
+
+_TG_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
+_TG_CHAT = os.environ.get("TELEGRAM_CHAT_ID")
+_TG_URL = f"https://api.telegram.org/bot{_TG_TOKEN}/sendMessage" if _TG_TOKEN else None
+if not _TG_URL or not _TG_CHAT:
+    logging.warning("⚠️ Telegram credentials missing; alerts are disabled.")
+
+_TG_SESSION = requests.Session()
+# Alerts from /chat are fired off the request thread so users don't wait on Telegram.
+_ALERT_EXECUTOR = ThreadPoolExecutor(max_workers=2)
+
+def _truncate(text, limit):
+    # Telegram counts UTF-16 units (emoji take 2); the "..." is kept inside the limit.
+    encoded = text.encode('utf-16-le')
+    if len(encoded) // 2 <= limit: return text
+    budget = limit - 3
+    # errors='ignore' drops a surrogate pair split by the cut.
+    cut = encoded[:budget * 2].decode('utf-16-le', errors='ignore')
+    brk = max(cut.rfind("\n"), cut.rfind(" "))
+    if brk > budget // 2: cut = cut[:brk]
+    return cut.rstrip() + "..."
+
 def send_telegram(session_id, profile, history, title="HOT LEAD CAPTURED"):
-    token = os.environ.get("TELEGRAM_BOT_TOKEN")
-    chat_id = os.environ.get("TELEGRAM_CHAT_ID")
-    if not token or not chat_id: 
-        logging.error("Telegram credentials missing.")
-        return
+    if not _TG_URL or not _TG_CHAT: return
 
-    chat_log = ""
-    for msg in history:
-        icon = "👤" if msg['role'] == "user" else "🤖"
-        chat_log += f"{icon} {msg['content']}\n"
+    chat_log = "".join(
+        f"{'👤' if msg['role'] == 'user' else '🤖'} {msg['content']}\n" for msg in history
+    )
 
     report = (
         f"🚨 **{title}**\n"
@@ -102,27 +179,57 @@ def send_telegram(session_id, profile, history, title="HOT LEAD CAPTURED"):
         f"{chat_log}"
     )
 
-    if len(report) > 4000: report = report[:4000] + "..."
+    report = _truncate(report, TELEGRAM_MAX_CHARS)
 
     try:
-        requests.post(f"https://api.telegram.org/bot{token}/sendMessage", 
-                      json={"chat_id": chat_id, "text": report})
+        _TG_SESSION.post(_TG_URL, json={"chat_id": _TG_CHAT, "text": report}, timeout=TELEGRAM_TIMEOUT)
         logging.info(f"✅ Telegram Sent: {title}")
     except Exception as e:
         logging.error(f"Telegram Fail: {e}")
 
 # --- NODE 3: ANALYSIS ---
-def analyze_situation(session, user_message):
-    profile = session['profile']
-    context_dump = json.dumps(session['history'][-6:]) 
-    
-    system_prompt = f"""
+_EMAIL_RE = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+_PHONE_RE = re.compile(r"\+?[\d\s\-()]{7,}")
+_WORD_RE = re.compile(r"\w+")
+_FAST_GREETINGS = frozenset({"hi", "hello", "hey", "salam", "سلام", "درود"})
+# Shared by the fast classifier and the alert check in chat_endpoint.
+_AGREEMENT_WORDS = frozenset({"yes", "bale", "ok", "okay", "please", "call", "بله", "باشه", "حتما", "تماس"})
+_FAST_URGENT = frozenset({"asap", "urgent", "فوری"})
+# A short message is fast-pathed only if EVERY word is in the stage's vocabulary or its fillers,
+# so "don't call" or "hello, price?" still go to the LLM.
+_GREETING_OK = _FAST_GREETINGS | {"there", "all", "everyone"}
+_AGREEMENT_OK = _AGREEMENT_WORDS | {"me", "now", "بگیرید", "بگیر"}
+_URGENT_OK = _FAST_URGENT | _GREETING_OK | _AGREEMENT_OK
+_AGREEMENT_RE = re.compile(r"\b(?:%s)\b" % "|".join(map(re.escape, _AGREEMENT_WORDS)), re.IGNORECASE)
+
+def _looks_like_phone(msg):
+    # Only unambiguous shapes (+country or leading 0, 8-15 digits); bare numbers like prices go to the LLM.
+    if not _PHONE_RE.fullmatch(msg): return False
+    digits = _only_digits(msg)
+    if not 8 <= len(digits) <= 15: return False
+    return msg.startswith("+") or digits[0] in "0۰"  # ASCII or Persian zero
+
+def _fast_classify(user_message, user_message_lower=None):
+    # Cheap local rules for obvious messages; returns (stage, contact) or None to fall through to the LLM.
+    msg = user_message.strip()
+    if _EMAIL_RE.fullmatch(msg) or _looks_like_phone(msg):
+        return 'SALES_READY', msg
+
+    if user_message_lower is None: user_message_lower = user_message.lower()
+    words = _WORD_RE.findall(user_message_lower)
+    if not words or len(words) > 3: return None
+    tokens = set(words)
+    # Strongest signal first: "hi urgent" is URGENT, not GREETING.
+    if tokens & _FAST_URGENT and tokens <= _URGENT_OK: return 'URGENT', None
+    if tokens & _AGREEMENT_WORDS and tokens <= _AGREEMENT_OK: return 'SALES_READY', None
+    if tokens & _FAST_GREETINGS and tokens <= _GREETING_OK: return 'GREETING', None
+    return None
+
+ANALYZER_SYS = """
     Role: Strategic AI Analyst.
-    Context: {context_dump}
-    Current Msg: "{user_message}"
-    Profile: {json.dumps(profile)}
+    Input: The recent conversation, ending with the user's current message.
     
-    Task: Determine STAGE and Extract Data.
+    Task: Determine STAGE of the CURRENT message and Extract Data.
     
     STAGES:
     - 'GREETING': Hello, Hi.
@@ -136,13 +243,27 @@ def analyze_situation(session, user_message):
     2. "Yes" or "Bale" = SALES_READY.
     3. Contact extraction must be exact.
     
-    Output JSON: {{ "stage": "...", "name": "...", "contact": "...", "project_type": "..." }}
+    Output JSON: { "stage": "...", "name": "...", "contact": "...", "project_type": "..." }
     """
+
+def analyze_situation(session, user_message, user_message_lower=None):
+    profile = session['profile']
+
+    fast = _fast_classify(user_message, user_message_lower)
+    if fast:
+        stage, contact = fast
+        if contact: profile['contact'] = contact
+        return stage, bool(contact)
+
     try:
-        response = call_ai([{"role": "system", "content": system_prompt}], json_mode=True, temperature=0.1)
+        messages = [{"role": "system", "content": ANALYZER_SYS}]
+        history = session['history']
+        messages.extend(islice(history, max(len(history) - 6, 0), None))
+        messages.append({"role": "user", "content": user_message})
+        response = call_ai(messages, json_mode=True, temperature=0.1)
         if not response: return 'GREETING', False
         
-        data = json.loads(response)
+        data = orjson.loads(response)
         
         if data.get('name'): profile['name'] = data['name']
         if data.get('project_type'): profile['project_type'] = data['project_type']
@@ -151,74 +272,112 @@ def analyze_situation(session, user_message):
         contact_found_now = False
         
         if is_real_contact(extracted_contact):
-            clean_extracted = re.sub(r"\D", "", str(extracted_contact))
-            clean_msg = re.sub(r"\D", "", str(user_message))
-            is_in_text = (clean_extracted in clean_msg) if len(clean_extracted) > 5 else (str(extracted_contact) in user_message)
+            contact_str = str(extracted_contact)
+            is_in_text = contact_str in user_message
+            if not is_in_text:
+                # Model may have reformatted a phone number; compare digits only.
+                clean_extracted = _only_digits(contact_str)
+                is_in_text = len(clean_extracted) > 5 and clean_extracted in _only_digits(user_message)
             
             if is_in_text:
                 profile['contact'] = extracted_contact
                 contact_found_now = True
             
         session['profile'] = profile
-        return data.get('stage', 'GREETING'), contact_found_now
+        stage = data.get('stage')
+        return (stage if isinstance(stage, str) else 'GREETING'), contact_found_now
         
     except Exception as e:
         logging.error(f"Analysis Failed: {e}")
         return 'GREETING', False
 
 # --- NODE 4: GENERATION ---
-def generate_smart_response(session, user_message, stage, contact_found_now, language='en'):
-    profile = session['profile']
-    
-    if language == 'fa':
-        lang_instr = "Answer in Persian (Farsi). Tone: Professional & Polite."
-    else:
-        lang_instr = "Answer in English. Tone: Professional."
-
-    strategy = ""
-    
-    if contact_found_now:
-        strategy = "CLOSING: Thank them. Confirm an expert will call."
-    
-    elif profile.get('contact'):
-        if stage == 'URGENT':
-            strategy = "VIP URGENT: 'I have your number. Team alerted.'"
-        elif stage == 'SALES_READY':
-            strategy = "VIP SALES: 'I have your info. Team will call you to finalize.'"
-        else:
-            strategy = "VIP CONSULTANT: Answer questions helpfuly. Do NOT ask for contact."
-            
-    else:
-        if stage == 'URGENT':
-            strategy = "URGENT: Ask for phone number immediately."
-        elif stage == 'SALES_READY':
-            strategy = "SALES: 'To proceed/give price, I need your contact info.'"
-        elif stage == 'DISCOVERY':
-            strategy = "DISCOVERY: Acknowledge project. Ask 1 key question."
-        elif stage == 'CONSULTING':
-            strategy = "ADVISOR: Give advice. Ask follow up."
-        else:
-            strategy = "GREETING: Welcome them."
-
-    system_prompt = f"""
+_CLOSING_STRATEGY = "CLOSING: Thank them. Confirm an expert will call."
+# (has_contact, stage) -> goal; '*' is the fallback for unlisted stages.
+_STRATEGY = {
+    (True, 'URGENT'): "VIP URGENT: 'I have your number. Team alerted.'",
+    (True, 'SALES_READY'): "VIP SALES: 'I have your info. Team will call you to finalize.'",
+    (True, '*'): "VIP CONSULTANT: Answer questions helpfuly. Do NOT ask for contact.",
+    (False, 'URGENT'): "URGENT: Ask for phone number immediately.",
+    (False, 'SALES_READY'): "SALES: 'To proceed/give price, I need your contact info.'",
+    (False, 'DISCOVERY'): "DISCOVERY: Acknowledge project. Ask 1 key question.",
+    (False, 'CONSULTING'): "ADVISOR: Give advice. Ask follow up.",
+    (False, '*'): "GREETING: Welcome them.",
+}
+
+_LANG_INSTR_FA = "Answer in Persian (Farsi). Tone: Professional & Polite."
+_LANG_INSTR_EN = "Answer in English. Tone: Professional."
+# Filled with (profile JSON, strategy, knowledge_base, lang_instr).
+_RESPONDER_TMPL = """
     Role: Senior Lunotech Consultant.
-    Profile: {json.dumps(profile)}
-    Goal: {strategy}
-    Info: {data_store.knowledge_base}
+    Profile: %s
+    Goal: %s
+    Info: %s
     
     RULES:
-    1. {lang_instr}
+    1. %s
     2. MAX 40 WORDS.
     3. NO TECH JARGON.
     """
-    
+
+def build_response_messages(session, user_message, stage, contact_found_now, language='en'):
+    profile = session['profile']
+    lang_instr = _LANG_INSTR_FA if language == 'fa' else _LANG_INSTR_EN
+
+    if contact_found_now:
+        strategy = _CLOSING_STRATEGY
+    else:
+        has_contact = bool(profile.get('contact'))
+        strategy = _STRATEGY.get((has_contact, stage)) or _STRATEGY[(has_contact, '*')]
+
+    system_prompt = _RESPONDER_TMPL % (orjson.dumps(profile).decode(), strategy, data_store.knowledge_base, lang_instr)
+
     messages = [{"role": "system", "content": system_prompt}]
     messages.extend(session['history'])
     messages.append({"role": "user", "content": user_message})
-    
-    return call_ai(messages)
+    return messages
+
+def generate_smart_response(session, user_message, stage, contact_found_now, language='en'):
+    return call_ai(build_response_messages(session, user_message, stage, contact_found_now, language))
+
+def record_turn(session, user_message, bot_reply):
+    session["history"].append({"role": "user", "content": user_message})
+    session["history"].append({"role": "assistant", "content": bot_reply})
+
+def touch_session(session_id):
+    # Fetch or create the session, mark it most recently used and evict stale/excess ones.
+    now = time.monotonic()
+    with _SESSIONS_LOCK:
+        session = SESSIONS.get(session_id)
+        if session is None:
+            session = SESSIONS[session_id] = {
+                "history": deque(maxlen=HISTORY_LIMIT),
+                "profile": {"name": None, "contact": None, "project_type": None},
+                "alert_sent": False,
+                "high_priority_alert_sent": False,
+                "_lock": Lock()  # serializes concurrent turns of the same session
+            }
+        else:
+            SESSIONS.move_to_end(session_id)
+        session['_last_seen'] = now
+
+        while len(SESSIONS) > MAX_SESSIONS:
+            SESSIONS.popitem(last=False)
+        while SESSIONS:
+            oldest = next(iter(SESSIONS.values()))
+            if now - oldest['_last_seen'] <= SESSION_TTL: break
+            SESSIONS.popitem(last=False)
+    return session
 
 # --- ROUTES ---
+_ALLOWED_ALERT_STAGES = frozenset({'SALES_READY', 'URGENT'})
+_NO_ALERT_STAGES = frozenset({'GREETING', 'DISCOVERY', 'CONSULTING'})
+
+_CHAT_ERROR = {"text": "System Error.", "quick_replies": []}
+
+def _json_response(payload):
+    # Hot-path responses skip jsonify and the JSON provider.
+    return Response(orjson.dumps(payload), mimetype='application/json')
 
 @app.route('/', methods=['GET'])
 def health_check():
@@ -227,79 +386,112 @@ def health_check():
 @app.route('/chat', methods=['POST'])
 def chat_endpoint():
     try:
-        data = request.json
-        user_msg = data.get('message', '')
+        data = request.get_json(silent=True, cache=False)
+        user_msg = data.get('message') if isinstance(data, dict) else None
+        # Malformed bodies and blank messages never reach the analyzer or the guest session.
+        if not isinstance(user_msg, str) or not user_msg.strip():
+            return _json_response(_CHAT_ERROR)
+        user_msg_l = user_msg.lower()
         session_id = data.get('session_id', 'guest')
         stored_contact = data.get('stored_contact', None)
         site_lang = data.get('language', 'en')
 
-        if session_id not in SESSIONS:
-            SESSIONS[session_id] = {
-                "history": [], 
-                "profile": {"name": None, "contact": None, "project_type": None},
-                "alert_sent": False,
-                "high_priority_alert_sent": False
-            }
-        session = SESSIONS[session_id]
-
-        if stored_contact and not session['profile']['contact']:
-            if is_real_contact(stored_contact):
-                session['profile']['contact'] = stored_contact
-                logging.info(f"🍪 Cookie Loaded: {stored_contact}")
+        session = touch_session(session_id)
+        lock = session['_lock']
+        lock.acquire()
+        streaming = False
+        try:
+            if stored_contact and not session['profile']['contact']:
+                if is_real_contact(stored_contact):
+                    session['profile']['contact'] = stored_contact
+                    logging.info(f"🍪 Cookie Loaded: {stored_contact}")
 
-        stage, contact_found_now = analyze_situation(session, user_msg)
-        
-        # --- ALERT LOGIC ---
-        should_alert = False
-        has_contact = is_real_contact(session['profile'].get('contact'))
-        
-        ALLOWED_ALERT_STAGES = ['SALES_READY', 'URGENT']
-        agreement_words = ["bale", "yes", "ok", "please", "بله", "باشه", "حتما", "تماس", "call"]
-        is_agreement = any(w in user_msg.lower() for w in agreement_words)
-
-        if contact_found_now:
-            should_alert = True
-        elif (stage in ALLOWED_ALERT_STAGES or is_agreement) and has_contact:
-            if not session.get('high_priority_alert_sent'):
-                should_alert = True
-                session['high_priority_alert_sent'] = True 
+            stage, contact_found_now = analyze_situation(session, user_msg, user_msg_l)
 
-        if stage in ['GREETING', 'DISCOVERY', 'CONSULTING'] and not contact_found_now and not is_agreement:
+            # --- ALERT LOGIC ---
             should_alert = False
+            has_contact = is_real_contact(session['profile'].get('contact'))
 
-        if should_alert:
-            temp_history = session["history"] + [{"role": "user", "content": user_msg}]
-            alert_title = "HOT LEAD - SALES READY" if is_agreement else f"HOT LEAD - {stage}"
-            if contact_found_now: alert_title = "HOT LEAD - NEW CONTACT"
-            
-            send_telegram(session_id, session['profile'], temp_history, title=alert_title)
-            session['alert_sent'] = True
-            logging.info(f"🚨 Alert Sent: {alert_title}")
+            is_agreement = bool(_AGREEMENT_RE.search(user_msg_l))
 
-        bot_reply = generate_smart_response(session, user_msg, stage, contact_found_now, language=site_lang)
-        
-        session["history"].append({"role": "user", "content": user_msg})
-        session["history"].append({"role": "assistant", "content": bot_reply})
-        session["history"] = session["history"][-HISTORY_LIMIT:]
-        
-        return jsonify({
-            "text": bot_reply, 
-            "quick_replies": [],
-            "save_contact": session['profile'].get('contact') 
-        })
+            if contact_found_now:
+                should_alert = True
+            elif (stage in _ALLOWED_ALERT_STAGES or is_agreement) and has_contact:
+                if not session.get('high_priority_alert_sent'):
+                    should_alert = True
+                    session['high_priority_alert_sent'] = True 
+
+            if stage in _NO_ALERT_STAGES and not contact_found_now and not is_agreement:
+                should_alert = False
+
+            if should_alert:
+                temp_history = list(session["history"]) + [{"role": "user", "content": user_msg}]
+                alert_title = "HOT LEAD - SALES READY" if is_agreement else f"HOT LEAD - {stage}"
+                if contact_found_now: alert_title = "HOT LEAD - NEW CONTACT"
+
+                _ALERT_EXECUTOR.submit(send_telegram, session_id, dict(session['profile']), temp_history, title=alert_title)
+                session['alert_sent'] = True
+                logging.info(f"🚨 Alert Queued: {alert_title}")
+
+            # Opt-in SSE: clients sending "stream": true get tokens as they are generated.
+            if data.get('stream'):
+                messages = build_response_messages(session, user_msg, stage, contact_found_now, language=site_lang)
+
+                parts = []
+                recorded = False
+
+                def finish_turn():
+                    nonlocal recorded
+                    if recorded: return
+                    recorded = True
+                    record_turn(session, user_msg, "".join(parts))
+
+                def event_stream():
+                    try:
+                        for token in call_ai_stream(messages):
+                            parts.append(token)
+                            yield f"data: {orjson.dumps({'text': token}).decode()}\n\n"
+                    finally:
+                        # Runs on client disconnect too, so the (possibly partial) turn is kept.
+                        finish_turn()
+                    yield f"data: {orjson.dumps({'done': True, 'quick_replies': [], 'save_contact': session['profile'].get('contact')}).decode()}\n\n"
+
+                def on_close():
+                    # The session lock stays held until the stream is closed, even if it never started.
+                    try:
+                        finish_turn()
+                    finally:
+                        lock.release()
+
+                response = Response(stream_with_context(event_stream()), mimetype='text/event-stream')
+                response.call_on_close(on_close)
+                streaming = True
+                return response
+
+            bot_reply = generate_smart_response(session, user_msg, stage, contact_found_now, language=site_lang)
+            record_turn(session, user_msg, bot_reply)
+
+            return _json_response({
+                "text": bot_reply, 
+                "quick_replies": [],
+                "save_contact": session['profile'].get('contact') 
+            })
+        finally:
+            if not streaming: lock.release()
 
     except Exception as e:
         logging.error(f"Error: {e}")
-        return jsonify({"text": "System Error.", "quick_replies": []}), 200
+        return _json_response(_CHAT_ERROR)
 
 @app.route('/report', methods=['POST'])
 def report_endpoint():
     try:
         data = request.json
         session_id = data.get('session_id', 'guest')
-        if session_id in SESSIONS:
-            session = SESSIONS[session_id]
-            send_telegram(session_id, session['profile'], session['history'], title="⚠️ USER REPORTED ERROR")
+        with _SESSIONS_LOCK:
+            session = SESSIONS.get(session_id)
+        if session is not None:
+            send_telegram(session_id, dict(session['profile']), list(session['history']), title="⚠️ USER REPORTED ERROR")
             return jsonify({"status": "success", "message": "Report sent."})
         return jsonify({"status": "error", "message": "Session not found."})
     except Exception as e: